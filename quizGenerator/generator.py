@@ -1,31 +1,169 @@
 # generator.py
 import asyncio
-import json
+import functools
+import inspect
+import os
+import random
 import re
-from typing import Any, Optional, List, Dict
-
-from agents import Agent, ModelSettings, OpenAIChatCompletionsModel, RunConfig, Runner, SQLiteSession, function_tool, trace
+import sqlite3
+import string
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional, List, Dict
+from urllib.parse import quote
+
+import aiofiles
+from agents import Agent, ModelSettings, OpenAIChatCompletionsModel, Runner, SQLiteSession, function_tool, trace
 from agents.exceptions import ModelBehaviorError
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
-from ddgs import DDGS
-import urllib
-import wikipediaapi
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError
+import httpx
+import orjson
+
+from pydantic import TypeAdapter, ValidationError
 
-from shema import Quiz
+from shema import QuestionItem, Quiz, ThemeEntry
 
 load_dotenv(override=True)
-search = DDGS()
+
+
+def _ddgs_call(method: str, **kwargs: Any) -> list[dict[str, Any]]:
+    # Runs in a worker thread. DDGS is not safe to share between threads,
+    # so every call gets its own instance; importing lazily keeps startup fast.
+    from ddgs import DDGS
+
+    return getattr(DDGS(), method)(**kwargs)
+
+
+_RE_JSON_ERR = re.compile(r"parsing\s+(\{.*)\s+for\s+TypeAdapter", re.DOTALL)
+_RE_HTML_TAG = re.compile(r"<[^>]+>")
+_RE_SENT = re.compile(r"(?<=[.!?])\s+")
+_RE_UNDERS = re.compile(r"_+")
+
+# Maps every ASCII char outside [A-Za-z0-9_-] to "_" (non-ASCII is turned into "?" first)
+_FNAME_ALLOWED = frozenset(string.ascii_letters + string.digits + "_-")
+_FNAME_TRANS = str.maketrans({chr(c): "_" for c in range(128) if chr(c) not in _FNAME_ALLOWED})
+
+_QLIST_ADAPTER = TypeAdapter(List[QuestionItem])
+_THEME_ADAPTER = TypeAdapter(ThemeEntry)
+
+_HTTP: Optional[httpx.AsyncClient] = None
+
+
+def _get_http() -> httpx.AsyncClient:
+    # One pooled keep-alive client shared by the LLM client and all tools,
+    # so requests reuse connections instead of paying DNS + TLS setup each time
+    global _HTTP
+    if _HTTP is None:
+        _HTTP = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            headers={"User-Agent": "QuizGenerator/1.0 (educational use)"},
+        )
+    return _HTTP
+
+
+async def _close_http() -> None:
+    global _HTTP
+    if _HTTP is not None:
+        await _HTTP.aclose()
+        _HTTP = None
+
+
+_TOOL_CACHE_PATH = os.getenv("QUIZ_TOOL_CACHE", ".tool_cache.sqlite")
+# Set from QUIZ_TOOL_CACHE_MAX_ROWS by main()
+_TOOL_CACHE_MAX_ROWS = 5000
+_TOOL_CACHE: Optional[sqlite3.Connection] = None
+# Cache access runs in worker threads; one connection, serialized by this lock
+_TOOL_CACHE_LOCK = threading.Lock()
+
+
+def _get_tool_cache() -> sqlite3.Connection:
+    # Caller must hold _TOOL_CACHE_LOCK
+    global _TOOL_CACHE
+    if _TOOL_CACHE is None:
+        db = sqlite3.connect(_TOOL_CACHE_PATH, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)"
+        )
+        db.execute("DELETE FROM tool_cache WHERE expires <= ?", (time.time(),))
+        db.commit()
+        _TOOL_CACHE = db
+    return _TOOL_CACHE
+
+
+def _tool_cache_get(key: str) -> Optional[str]:
+    with _TOOL_CACHE_LOCK:
+        db = _get_tool_cache()
+        now = time.time()
+        row = db.execute("SELECT value FROM tool_cache WHERE key = ? AND expires > ?", (key, now)).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE tool_cache SET used = ? WHERE key = ?", (now, key))
+        db.commit()
+        return row[0]
+
+
+def _tool_cache_set(key: str, value: str, ttl: float) -> None:
+    with _TOOL_CACHE_LOCK:
+        db = _get_tool_cache()
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO tool_cache (key, value, expires, used) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        # Evict least recently used rows beyond the cap
+        db.execute(
+            "DELETE FROM tool_cache WHERE key IN "
+            "(SELECT key FROM tool_cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (_TOOL_CACHE_MAX_ROWS,),
+        )
+        db.commit()
+
+
+def _memoize(ttl: float) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """
+    Persistent LRU cache for tool calls, keyed by (tool name, bound arguments).
+    Retries and themes sharing keywords issue the same queries over and over.
+    Empty results are not stored, so transient network failures are not cached.
+    """
+    def deco(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrap(*args: Any, **kwargs: Any) -> Any:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = f"{fn.__name__}:{orjson.dumps(bound.arguments, option=orjson.OPT_SORT_KEYS).decode()}"
+
+            cached = await asyncio.to_thread(_tool_cache_get, key)
+            if cached is not None:
+                return orjson.loads(cached)
+
+            value = await fn(*args, **kwargs)
+            if value:
+                await asyncio.to_thread(_tool_cache_set, key, orjson.dumps(value).decode(), ttl)
+            return value
+
+        return wrap
+
+    return deco
 
 
 @function_tool
-def search_on_duckduckgo(
+@_memoize(ttl=86400)
+async def search_on_duckduckgo(
     query: str,
     region: str = "hu-hu",
     timelimit: Optional[str] = None,
     max_results: Optional[int] = 5,
 ) -> list[dict[str, Any]]:
-    return search.text(
+    # ddgs has no async API, so run it in a worker thread
+    return await asyncio.to_thread(
+        _ddgs_call,
+        "text",
         query=query,
         max_results=max_results,
         region=region,
@@ -35,13 +173,16 @@ def search_on_duckduckgo(
 
 
 @function_tool
-def search_on_duckduckgo_news(
+@_memoize(ttl=86400)
+async def search_on_duckduckgo_news(
     query: str,
     region: str = "hu-hu",
     timelimit: Optional[str] = None,
     max_results: Optional[int] = 5,
 ) -> list[dict[str, Any]]:
-    return search.news(
+    return await asyncio.to_thread(
+        _ddgs_call,
+        "news",
         query=query,
         max_results=max_results,
         region=region,
@@ -51,13 +192,16 @@ def search_on_duckduckgo_news(
 
 
 @function_tool
-def search_on_duckduckgo_books(
+@_memoize(ttl=86400)
+async def search_on_duckduckgo_books(
     query: str,
     region: str = "hu-hu",
     timelimit: Optional[str] = None,
     max_results: Optional[int] = 5,
 ) -> list[dict[str, Any]]:
-    return search.books(
+    return await asyncio.to_thread(
+        _ddgs_call,
+        "books",
         query=query,
         max_results=max_results,
         region=region,
@@ -66,7 +210,8 @@ def search_on_duckduckgo_books(
     )
     
 @function_tool
-def wikipedia_search(
+@_memoize(ttl=86400)
+async def wikipedia_search(
     query: str,
     lang: str = "hu",
     limit: int = 5,
@@ -75,29 +220,25 @@ def wikipedia_search(
     REAL Wikipedia search using MediaWiki API.
     Returns article titles that actually exist.
     """
-    import urllib.parse
-    import urllib.request
-    import json
-
     query = (query or "").strip()
     if not query:
         return []
 
     limit = max(1, min(limit, 10))
 
-    url = (
-        f"https://{lang}.wikipedia.org/w/api.php"
-        "?action=query"
-        "&list=search"
-        "&format=json"
-        "&utf8=1"
-        f"&srlimit={limit}"
-        f"&srsearch={urllib.parse.quote(query)}"
-    )
+    params = {
+        "action": "query",
+        "list": "search",
+        "format": "json",
+        "utf8": 1,
+        "srlimit": limit,
+        "srsearch": query,
+    }
 
     try:
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
+        resp = await _get_http().get(f"https://{lang}.wikipedia.org/w/api.php", params=params, timeout=10)
+        resp.raise_for_status()
+        data = orjson.loads(resp.content)
     except Exception:
         return []
 
@@ -109,7 +250,7 @@ def wikipedia_search(
 
         results.append({
             "title": title,
-            "snippet": re.sub(r"<[^>]+>", "", item.get("snippet", "")),
+            "snippet": _RE_HTML_TAG.sub("", item.get("snippet", "")),
             "url": f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}",
         })
 
@@ -117,7 +258,8 @@ def wikipedia_search(
 
 
 @function_tool
-def wikipedia_summary(
+@_memoize(ttl=86400)
+async def wikipedia_summary(
     title: str,
     lang: str = "hu",
     max_sentences: int = 3,
@@ -135,10 +277,17 @@ def wikipedia_summary(
             "url": "",
         }
 
-    wiki = _get_wiki(lang)
-    page = wiki.page(title)
+    # REST summary endpoint: a few KB of JSON with the lead extract, no HTML to parse
+    url = f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{quote(title.replace(' ', '_'), safe='')}"
+    resp = await _get_http().get(url, timeout=10, follow_redirects=True)
+
+    if resp.status_code == 404:
+        data: dict[str, Any] = {}
+    else:
+        resp.raise_for_status()
+        data = orjson.loads(resp.content)
 
-    if not page.exists():
+    if data.get("type") != "standard":
         return {
             "title": title,
             "summary": "",
@@ -146,46 +295,24 @@ def wikipedia_summary(
             "url": "",
         }
 
-    summary = page.summary.strip()
+    summary = (data.get("extract") or "").strip()
 
     # Sentence limiting (safe heuristic)
     if summary and max_sentences > 0:
-        parts = re.split(r"(?<=[.!?])\s+", summary)
+        parts = _RE_SENT.split(summary)
         summary = " ".join(parts[:max_sentences])
 
     return {
-        "title": page.title,
+        "title": data.get("title") or title,
         "summary": summary,
         "exists": True,
-        "url": page.fullurl,
+        "url": data.get("content_urls", {}).get("desktop", {}).get("page", ""),
     }
 
 
-_WIKI_CACHE: dict[str, wikipediaapi.Wikipedia] = {}
-
-
-def _get_wiki(lang: str) -> wikipediaapi.Wikipedia:
-    if lang not in _WIKI_CACHE:
-        _WIKI_CACHE[lang] = wikipediaapi.Wikipedia(
-            language=lang,
-            user_agent="QuizGenerator/1.0 (educational use)"
-        )
-    return _WIKI_CACHE[lang]
-
-
-def _sanitize_quiz(quiz: Quiz) -> Quiz:
-    # Extra safety net (schema already enforces this, but keep it anyway)
-    for q in quiz.Questions:
-        if q.Answer.AnswerType == 0:
-            q.Answer.MultiChoiceAnswer = None
-        else:
-            q.Answer.TrueFalseAnswers = None
-    return quiz
-
-
 def _extract_json_object_from_error(msg: str) -> Optional[str]:
     # agents often embeds: 'Invalid JSON when parsing { ... } for TypeAdapter(Quiz)'
-    m = re.search(r"parsing\s+(\{.*)\s+for\s+TypeAdapter", msg, flags=re.DOTALL)
+    m = _RE_JSON_ERR.search(msg)
     if not m:
         return None
 
@@ -196,9 +323,9 @@ def _extract_json_object_from_error(msg: str) -> Optional[str]:
     return candidate[: last + 1]
 
 
-def _build_system_prompt(min_questions: int) -> str:
-    # Must match the structured output schema: top-level object with "Questions"
-    return f"""
+# Must match the structured output schema: top-level object with "Questions".
+# {min_questions} is the only interpolation site; literal braces are doubled.
+_SYSTEM_PROMPT_TMPL = """
 You are a quiz generator. You MUST output ONLY a JSON object that matches this schema exactly:
 
 {{
@@ -247,38 +374,50 @@ If you are unsure about a fact, ask a safer, general-knowledge question rather t
 """.strip()
 
 
+@functools.lru_cache(maxsize=8)
+def _build_system_prompt(min_questions: int) -> str:
+    return _SYSTEM_PROMPT_TMPL.format(min_questions=min_questions)
+
+
 def _validate_content_rules(quiz: Quiz, min_questions: int) -> None:
-    if len(quiz.Questions) < min_questions:
-        raise ValueError(f"Too few questions: {len(quiz.Questions)} < {min_questions}")
-
-    seen_q = set()
-    has_tf = False
-    has_mc = False
-
-    for qi in quiz.Questions:
-        qtxt = qi.Question.strip().lower()
-        if qtxt in seen_q:
-            raise ValueError("Duplicate questions detected.")
-        seen_q.add(qtxt)
-
-        if qi.Answer.AnswerType == 0:
-            has_tf = True
-            if qi.Answer.TrueFalseAnswers is None:
+    questions = quiz.Questions
+    if len(questions) < min_questions:
+        raise ValueError(f"Too few questions: {len(questions)} < {min_questions}")
+
+    counts = Counter(q.Question.strip().casefold() for q in questions)
+    if max(counts.values(), default=0) > 1:
+        raise ValueError("Duplicate questions detected.")
+
+    types = {q.Answer.AnswerType for q in questions}
+    if 0 not in types or 1 not in types:
+        raise ValueError("Quiz must include both true/false and multiple-choice questions.")
+
+    # Normalize the unused answer block and check the per-answer rules
+    for q in questions:
+        answer = q.Answer
+        if answer.AnswerType == 0:
+            answer.MultiChoiceAnswer = None
+            if answer.TrueFalseAnswers is None:
                 raise ValueError("AnswerType=0 must have TrueFalseAnswers.")
-            if qi.Answer.MultiChoiceAnswer is not None:
-                raise ValueError("AnswerType=0 must not have MultiChoiceAnswer.")
         else:
-            has_mc = True
-            if not qi.Answer.MultiChoiceAnswer or len(qi.Answer.MultiChoiceAnswer) != 4:
+            answer.TrueFalseAnswers = None
+            options = answer.MultiChoiceAnswer
+            if not options or len(options) != 4:
                 raise ValueError("AnswerType=1 must have exactly 4 multi choice options.")
-            correct = sum(1 for opt in qi.Answer.MultiChoiceAnswer if opt.IsCorrect)
-            if correct != 1:
+            if sum(opt.IsCorrect for opt in options) != 1:
                 raise ValueError("AnswerType=1 must have exactly one correct option.")
-            if qi.Answer.TrueFalseAnswers is not None:
-                raise ValueError("AnswerType=1 must not have TrueFalseAnswers.")
+            if len({opt.Text.strip().casefold() for opt in options}) != len(options):
+                raise ValueError("AnswerType=1 must not have duplicate option texts.")
 
-    if not has_tf or not has_mc:
-        raise ValueError("Quiz must include both true/false and multiple-choice questions.")
+
+# Errors worth another attempt: model output problems, content-rule violations,
+# timeouts and transient server-side failures. Anything else fails fast.
+_RETRYABLE_ERRORS = (ValueError, TimeoutError, APIConnectionError, InternalServerError)
+
+# Seconds per theme after which no new attempt is started (QUIZ_TIME_BUDGET).
+# A single attempt can run up to 50 agent turns with web research, which easily takes
+# several minutes on a local model.
+_DEFAULT_TIME_BUDGET = 1800.0
 
 
 async def _run_with_retries(
@@ -286,22 +425,39 @@ async def _run_with_retries(
     user_prompt: str,
     min_questions: int,
     max_attempts: int = 4,
-) -> Quiz:
+    time_budget: float = _DEFAULT_TIME_BUDGET,
+    label: str = "",
+) -> Optional[Quiz]:
     prompt = user_prompt
+    # Several themes run at once; the label ties interleaved log lines to their theme
+    log_prefix = f"[{label}] " if label else ""
+    last_raw_hash: Optional[int] = None
+    started = time.monotonic()
 
     session = SQLiteSession("QuizGenAgent")
 
     for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            elapsed = time.monotonic() - started
+            if elapsed > time_budget:
+                raise TimeoutError(f"Gave up after {attempt - 1} attempts ({elapsed:.0f}s > {time_budget:.0f}s budget).")
+
         try:
             res = await Runner.run(agent, input=prompt, max_turns=50, session=session)
             quiz: Quiz = res.final_output
-            quiz = _sanitize_quiz(quiz)
             _validate_content_rules(quiz, min_questions=min_questions)
             return quiz
 
         except ModelBehaviorError as e:
             raw = _extract_json_object_from_error(str(e))
             if raw:
+                # Same broken output twice in a row: the repair prompt is not helping
+                raw_hash = hash(raw)
+                if raw_hash == last_raw_hash:
+                    print(f"{log_prefix}[Attempt {attempt}/{max_attempts}] Identical invalid output repeated -> giving up.")
+                    raise
+                last_raw_hash = raw_hash
+
                 prompt = (
                     "You previously produced invalid JSON for the required schema.\n"
                     "Fix it and output ONLY the corrected JSON object.\n\n"
@@ -321,20 +477,28 @@ async def _run_with_retries(
                     "Do not include MultiChoiceAnswer when AnswerType=0, and do not include TrueFalseAnswers when AnswerType=1."
                 )
 
-            print(f"[Attempt {attempt}/{max_attempts}] ModelBehaviorError -> retrying with repair prompt.")
+            print(f"{log_prefix}[Attempt {attempt}/{max_attempts}] ModelBehaviorError -> retrying with repair prompt.")
 
-        except Exception as e:
+        except _RETRYABLE_ERRORS as e:
             prompt = (
                 f"{user_prompt}\n\n"
                 "IMPORTANT: Follow the schema strictly and output ONLY JSON. "
                 f"Previous error: {type(e).__name__}: {e}"
             )
-            print(f"[Attempt {attempt}/{max_attempts}] {type(e).__name__} -> retrying.")
+            print(f"{log_prefix}[Attempt {attempt}/{max_attempts}] {type(e).__name__} -> retrying.")
+
+        except Exception as e:
+            print(f"{log_prefix}[Attempt {attempt}/{max_attempts}] {type(e).__name__}: {e} -> not retryable, giving up.")
+            raise
+
+        if attempt < max_attempts:
+            # Exponential backoff with jitter, so concurrent themes do not retry in lockstep
+            await asyncio.sleep(0.25 * (2 ** (attempt - 1)) + random.random() * 0.25)
 
-    #raise RuntimeError(f"Failed to generate a valid quiz after {max_attempts} attempts.")
     return None
 
 
+@functools.lru_cache(maxsize=1024)
 def _sanitize_filename(name: str) -> str:
     """
     Windows-safe filename:
@@ -343,28 +507,48 @@ def _sanitize_filename(name: str) -> str:
     - collapse multiple underscores
     - avoid empty names
     """
-    s = (name or "").strip()
-    s = re.sub(r"[^a-zA-Z0-9_-]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
-    return s or "quiz"
+    s = (name or "").strip().encode("ascii", "replace").decode("ascii").translate(_FNAME_TRANS)
+    return _RE_UNDERS.sub("_", s).strip("_") or "quiz"
 
 
 async def main(
     model_name: Optional[str] = None,
     prompts_path: str = "thema.json",
     min_questions: int = 10,
+    fail_fast: bool = False,
 ) -> None:
+    """
+    Generate one quiz file per theme, several themes at a time.
+    By default a failing theme is reported and skipped; with fail_fast=True the first
+    failure cancels the remaining themes and is raised as an ExceptionGroup.
+    """
+    global _TOOL_CACHE_MAX_ROWS
+
+    concurrency = int(os.getenv("QUIZ_CONCURRENCY", "8"))
+    if concurrency < 1:
+        raise ValueError(f"QUIZ_CONCURRENCY must be >= 1, got {concurrency}.")
+
+    cache_max_rows = int(os.getenv("QUIZ_TOOL_CACHE_MAX_ROWS", str(_TOOL_CACHE_MAX_ROWS)))
+    if cache_max_rows < 1:
+        # SQLite treats a negative OFFSET as 0, so the LRU eviction would empty the cache on every write
+        raise ValueError(f"QUIZ_TOOL_CACHE_MAX_ROWS must be >= 1, got {cache_max_rows}.")
+    _TOOL_CACHE_MAX_ROWS = cache_max_rows
+
+    time_budget = float(os.getenv("QUIZ_TIME_BUDGET", str(_DEFAULT_TIME_BUDGET)))
+    if not time_budget > 0:
+        raise ValueError(f"QUIZ_TIME_BUDGET must be > 0, got {time_budget}.")
+
     system_prompt = _build_system_prompt(min_questions=min_questions)
 
-    with open(prompts_path, "r", encoding="utf-8") as file:
-        data = json.load(file)
+    with open(prompts_path, "rb") as file:
+        data = orjson.loads(file.read())
 
     entries = data.get("thema", [])
     if not isinstance(entries, list) or not entries:
         raise ValueError(f"No entries found in '{prompts_path}' under key 'thema'.")
 
     # Model setup
-    base_client = AsyncOpenAI(base_url="http://localhost:11434/v1")
+    base_client = AsyncOpenAI(base_url="http://localhost:11434/v1", http_client=_get_http())
     if model_name is None:
         model = OpenAIChatCompletionsModel(model="gpt-oss:20b", openai_client=base_client)
     else:
@@ -379,58 +563,83 @@ async def main(
         model_settings=ModelSettings(temperature=0.2, top_p=1.0)
     )
 
-    # Track duplicates
+    # Resolve names and output paths up front, so concurrent workers never race on used_names
+    jobs: List[tuple[str, str, str]] = []
     used_names: Dict[str, int] = {}
 
-    with trace("Quiz Generator"):
-        for entry in entries:
-            if not isinstance(entry, dict):
-                print("Skipping invalid entry (not an object).")
-                continue
+    for raw_entry in entries:
+        # Every entry needs a non-empty "name" and "instruction"; skip the bad ones
+        try:
+            entry = _THEME_ADAPTER.validate_python(raw_entry)
+        except ValidationError as e:
+            problems = "; ".join(
+                f"missing/invalid '{err['loc'][0]}' ({err['msg']})" if err["loc"] else err["msg"]
+                for err in e.errors()
+            )
+            raw_name = raw_entry.get("name") if isinstance(raw_entry, dict) else None
+            if isinstance(raw_name, str) and raw_name.strip():
+                print(f"Skipping entry '{raw_name}': {problems}.")
+            else:
+                print(f"Skipping invalid entry: {problems}.")
+            continue
+
+        safe_base = _sanitize_filename(entry.name)
 
-            raw_name = entry.get("name")
-            instruction = entry.get("instruction")
+        # Deduplicate filename if needed
+        used_names[safe_base] = used_names.get(safe_base, 0) + 1
+        if used_names[safe_base] > 1:
+            safe_name = f"{safe_base}_{used_names[safe_base]}"
+        else:
+            safe_name = safe_base
 
-            if not isinstance(raw_name, str) or not raw_name.strip():
-                print("Skipping entry: missing/invalid 'name'.")
-                continue
-            if not isinstance(instruction, str) or not instruction.strip():
-                print(f"Skipping entry '{raw_name}': missing/invalid 'instruction'.")
-                continue
+        jobs.append((entry.name, entry.instruction, f"quiz/{safe_name}.json"))
 
-            safe_base = _sanitize_filename(raw_name)
+    # Each theme is dominated by LLM latency, so run several at once
+    sem = asyncio.Semaphore(concurrency)
 
-            # Deduplicate filename if needed
-            used_names[safe_base] = used_names.get(safe_base, 0) + 1
-            if used_names[safe_base] > 1:
-                safe_name = f"{safe_base}_{used_names[safe_base]}"
-            else:
-                safe_name = safe_base
+    async def generate(raw_name: str, instruction: str, out_path: str) -> None:
+        print("-" * 12)
+        print(f"Name: {raw_name}")
+        print(f"Instruction: {instruction}")
 
-            out_path = f"quiz/{safe_name}.json"
+        quiz = await _run_with_retries(
+            agent,
+            user_prompt=instruction,   # <— USE instruction as prompt
+            min_questions=min_questions,
+            max_attempts=4,
+            time_budget=time_budget,
+            label=raw_name,
+        )
 
-            print("-" * 12)
-            print(f"Name: {raw_name}")
-            print(f"Instruction: {instruction}")
+        if quiz is None:
+            raise RuntimeError("no valid quiz after retries")
 
-            quiz = await _run_with_retries(
-                agent,
-                user_prompt=instruction,   # <— USE instruction as prompt
-                min_questions=min_questions,
-                max_attempts=4,
-            )
-            
-            if quiz == None:
-                print(f"Failed to generate {raw_name}.")
-            else:
-                # Dump ONLY the array to match your required output format:
-                quiz_array = quiz.model_dump(mode="json", exclude_none=True)["Questions"]
+        # Dump ONLY the array to match your required output format.
+        # Serialized once by pydantic-core; the same bytes go to disk and to the console
+        payload = _QLIST_ADAPTER.dump_json(quiz.Questions, exclude_none=True, indent=2)
 
-                with open(out_path, "w", encoding="utf-8") as f:
-                    json.dump(quiz_array, f, ensure_ascii=False, indent=2)
+        async with aiofiles.open(out_path, "wb") as f:
+            await f.write(payload)
 
-                print(json.dumps(quiz_array, ensure_ascii=False, indent=2))
-                print(f"Saved: {out_path}")
+        print(payload.decode())
+        print(f"Saved: {out_path}")
+
+    async def handle(raw_name: str, instruction: str, out_path: str) -> None:
+        try:
+            async with sem:
+                await generate(raw_name, instruction, out_path)
+        except Exception as e:
+            if fail_fast:
+                raise
+            print(f"Failed to generate {raw_name}: {type(e).__name__}: {e}")
+
+    try:
+        with trace("Quiz Generator"):
+            async with asyncio.TaskGroup() as tg:
+                for job in jobs:
+                    tg.create_task(handle(*job))
+    finally:
+        await asyncio.shield(_close_http())
 
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
 # shema.py
 from __future__ import annotations
 
-from typing import Annotated, List, Optional, Literal, Any, Dict
-from pydantic import BaseModel, ConfigDict, Field, model_validator
+from dataclasses import dataclass
+from typing import Annotated, List, Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, model_validator
+
+__all__ = ["TrueFalseAnswer", "MultiChoiceItem", "AnswerSchema", "QuestionItem", "Quiz", "ThemeEntry"]
 
 
 class TrueFalseAnswer(BaseModel):
@@ -24,6 +27,7 @@ class AnswerSchema(BaseModel):
     """
     Robust schema:
     - Accepts minor model mistakes (like MultiChoiceAnswer: [] on true/false) and normalizes them.
+      The extra block is cleared after field validation, so it must still be well-formed.
     - Still enforces the *required* parts (TF must have TrueFalseAnswers; MC must have options).
     """
     model_config = ConfigDict(extra="forbid")
@@ -53,39 +57,23 @@ class AnswerSchema(BaseModel):
         ),
     ] = None
 
-    @model_validator(mode="before")
-    @classmethod
-    def _normalize_input(cls, data: Any) -> Any:
-        """
-        Make it tolerant to common LLM glitches:
-        - If AnswerType=0 and MultiChoiceAnswer is present (even []), drop it.
-        - If AnswerType=1 and TrueFalseAnswers is present, drop it.
-        """
-        if not isinstance(data, dict):
-            return data
-
-        # Copy defensively (avoid mutating caller dict)
-        d: Dict[str, Any] = dict(data)
-        at = d.get("AnswerType")
-
-        if at == 0:
-            # True/False: MultiChoiceAnswer must not exist (normalize away)
-            d.pop("MultiChoiceAnswer", None)
-        elif at == 1:
-            # Multiple-choice: TrueFalseAnswers must not exist (normalize away)
-            d.pop("TrueFalseAnswers", None)
-
-        return d
-
     @model_validator(mode="after")
     def _validate_shape(self) -> "AnswerSchema":
+        """
+        Normalize and validate in one step:
+        - Drop the answer block that does not belong to AnswerType (tolerates LLM glitches
+          like MultiChoiceAnswer: [] on true/false), as long as it is well-formed.
+        - Then enforce the block that AnswerType requires.
+        """
         if self.AnswerType == 0:
-            if self.TrueFalseAnswers is None:
-                raise ValueError("TrueFalseAnswers must be provided when AnswerType=0.")
             # Ensure clean shape
             self.MultiChoiceAnswer = None
+            if self.TrueFalseAnswers is None:
+                raise ValueError("TrueFalseAnswers must be provided when AnswerType=0.")
 
         else:  # AnswerType == 1
+            # Ensure clean shape
+            self.TrueFalseAnswers = None
             if not self.MultiChoiceAnswer:
                 raise ValueError("MultiChoiceAnswer must be provided when AnswerType=1.")
 
@@ -93,16 +81,7 @@ class AnswerSchema(BaseModel):
             if not any(opt.IsCorrect for opt in self.MultiChoiceAnswer):
                 raise ValueError("MultiChoiceAnswer must contain at least one IsCorrect=true option.")
 
-            # Prevent duplicate option text (common LLM failure)
-            seen = set()
-            for opt in self.MultiChoiceAnswer:
-                t = opt.Text.strip().lower()
-                if t in seen:
-                    raise ValueError("MultiChoiceAnswer contains duplicate Text options.")
-                seen.add(t)
-
-            # Ensure clean shape
-            self.TrueFalseAnswers = None
+            # Duplicate option texts are checked by generator._validate_content_rules
 
         return self
 
@@ -127,3 +106,17 @@ class Quiz(BaseModel):
         ...,
         description="The quiz questions as a list. When saving, you can dump only this list to get a pure JSON array.",
     )
+
+
+NonEmptyStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+
+@dataclass(slots=True, frozen=True)
+class ThemeEntry:
+    """
+    One entry of thema.json's "thema" list.
+    Each entry is validated once up front (see generator.main); invalid ones are skipped,
+    and the workers only read attributes.
+    """
+    name: NonEmptyStr
+    instruction: NonEmptyStr